@@ -1,18 +1,20 @@
 # FastAPI endpoint for document and media evaluation
-from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends
-from fastapi.responses import JSONResponse
-import tempfile
-import shutil
-import os
-from typing import List, Optional
-from app.services.project_doc import GeminiDocEvaluator
-from app.prompts import system_prompt
-from app.api.v1.schemas.eval import EvaluationResponse, EvaluationRequest
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, status, Depends
+import asyncio
+import io
+import logging
+import re
+from typing import BinaryIO, Optional, Union
+from app.core.config import settings
+from app.services.project_doc import EvaluatorBusyError, GeminiDocEvaluator
+from app.api.v1.schemas.eval import EvaluationError, EvaluationResponse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["evaluation"])
 
 # Allowed file extensions for upload
-ALLOWED_EXTENSIONS = {
+ALLOWED_EXTENSIONS = frozenset({
     # Document formats
     '.pdf', '.docx', '.doc', '.txt', '.rtf', '.odt', '.md',
     # Image formats
@@ -21,27 +23,95 @@ ALLOWED_EXTENSIONS = {
     '.mp4', '.webm', '.mov', '.avi', '.mkv',
     # Audio formats
     '.mp3', '.wav', '.ogg', '.m4a'
-}
+})
 
-def is_allowed_file(filename: str) -> bool:
-    """Check if the file has an allowed extension"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {ext.lstrip('.') for ext in ALLOWED_EXTENSIONS}
+# Longest allowed extension (dot included), so longer candidates are rejected without hashing
+_MAX_EXT_LEN = max(len(ext) for ext in ALLOWED_EXTENSIONS)
 
-@router.post("/evaluate", response_model=EvaluationResponse, status_code=status.HTTP_200_OK)
-async def evaluate_document(
-    file: UploadFile = File(..., description="The file to evaluate"),
-    step_name: str = "",
-    deliverable_name: str = "",
-    additional_context: Optional[str] = None
-):
+# Extracts the overall score from the evaluation markdown
+_SCORE_RE = re.compile(r'Overall Score:\s*(\d+)/')
+
+# Limit file size (e.g., 50MB)
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+
+class UploadTooLargeError(ValueError):
+    """Raised when more than the allowed number of bytes is read from an upload."""
+
+class StreamAdapter(io.RawIOBase):
+    """Read-only view of an upload's spooled file that refuses to read past ``limit`` bytes.
+    
+    Lets the Gemini SDK read the upload directly instead of from a temp-file copy.
     """
-    Evaluate a document, image, audio, or video file for a specific step and deliverable.
     
-    This endpoint accepts various file types including documents (PDF, DOCX, etc.),
-    images (JPG, PNG, etc.), audio (MP3, WAV), and video (MP4, WebM, etc.) files.
+    def __init__(self, raw: BinaryIO, limit: int):
+        self._raw = raw
+        self._limit = limit
     
-    The evaluation will be performed based on the specified step and deliverable criteria.
-    """
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._raw.seek(offset, whence)
+    
+    def tell(self) -> int:
+        return self._raw.tell()
+    
+    def size(self) -> int:
+        """Total size of the upload; leaves the stream rewound."""
+        size = self._raw.seek(0, io.SEEK_END)
+        self._raw.seek(0)
+        return size
+    
+    def readinto(self, b) -> int:
+        n = self._raw.readinto(b)
+        self._check_limit()
+        return n
+    
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size)
+        self._check_limit()
+        return chunk
+    
+    def _check_limit(self) -> None:
+        # The stream position is the running count of bytes handed out
+        if self._raw.tell() > self._limit:
+            raise UploadTooLargeError(f"Upload exceeds {self._limit} bytes")
+
+def _file_too_large(actual_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail={
+            "error": "file_too_large",
+            "message": f"File size exceeds the maximum allowed size of {MAX_FILE_SIZE // (1024 * 1024)}MB",
+            "max_size_mb": MAX_FILE_SIZE // (1024 * 1024),
+            "actual_size_mb": round(actual_size / (1024 * 1024), 2)
+        }
+    )
+
+def get_evaluator(request: Request) -> GeminiDocEvaluator:
+    """Return the process-wide evaluator created at startup."""
+    return request.app.state.evaluator
+
+def is_allowed_file(filename: str) -> bool:
+    """Check if the file has an allowed extension"""
+    dot = filename.rfind('.')
+    return (
+        dot != -1
+        and len(filename) - dot <= _MAX_EXT_LEN
+        and filename[dot:].lower() in ALLOWED_EXTENSIONS
+    )
+
+async def _evaluate_one(
+    file: UploadFile,
+    step_name: str,
+    deliverable_name: str,
+    additional_context: Optional[str],
+    evaluator: GeminiDocEvaluator
+) -> EvaluationResponse:
+    """Validate a single upload and evaluate it; failures surface as HTTPException."""
     # Validate file type
     if not file.filename or not is_allowed_file(file.filename):
         raise HTTPException(
@@ -64,11 +134,15 @@ async def evaluate_document(
             }
         )
     
-    # Save uploaded file to a temp location
-    tmp_path = None
+    # Hand the spooled upload straight to Gemini instead of copying it to a temp file
+    stream = StreamAdapter(file.file, limit=MAX_FILE_SIZE)
     try:
+        # Measure what was actually received rather than trusting file.size,
+        # which is unset for chunked uploads
+        size = stream.size()
+        
         # Ensure the file has content
-        if not file.size or file.size == 0:
+        if size == 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail={
@@ -76,26 +150,8 @@ async def evaluate_document(
                     "message": "The uploaded file is empty"
                 }
             )
-            
-        # Limit file size (e.g., 50MB)
-        max_file_size = 50 * 1024 * 1024  # 50MB
-        if file.size > max_file_size:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail={
-                    "error": "file_too_large",
-                    "message": f"File size exceeds the maximum allowed size of 50MB",
-                    "max_size_mb": 50,
-                    "actual_size_mb": round(file.size / (1024 * 1024), 2)
-                }
-            )
-            
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp:
-            # Read file in chunks to handle large files
-            while chunk := await file.read(1024 * 1024):  # 1MB chunks
-                tmp.write(chunk)
-            tmp_path = tmp.name
+        if size > MAX_FILE_SIZE:
+            raise _file_too_large(size)
             
     except HTTPException:
         raise  # Re-raise HTTP exceptions
@@ -109,28 +165,20 @@ async def evaluate_document(
         )
     
     # Process the file with step and deliverable context
-    evaluator = GeminiDocEvaluator()
-    
     try:
         # Get the evaluation from Gemini
-        evaluation = await evaluator.evaluate(
-            file_path=tmp_path,
+        evaluation = await evaluator.evaluate_stream(
+            stream=stream,
+            mime_type=file.content_type,
             step_name=step_name,
             deliverable_name=deliverable_name,
-            additional_context=additional_context
+            additional_context=additional_context,
+            display_name=file.filename
         )
         
         # Parse the evaluation to extract score if possible
-        score = None
-        if evaluation:
-            # Try to extract score from the evaluation text
-            import re
-            score_match = re.search(r'Overall Score:\s*(\d+)/', evaluation)
-            if score_match:
-                try:
-                    score = float(score_match.group(1))
-                except (ValueError, IndexError):
-                    pass
+        score_match = _SCORE_RE.search(evaluation) if evaluation else None
+        score = int(score_match.group(1)) if score_match else None
         
         # Return the evaluation with the step and deliverable information
         return EvaluationResponse(
@@ -142,6 +190,16 @@ async def evaluate_document(
         
     except HTTPException:
         raise  # Re-raise HTTP exceptions
+    except EvaluatorBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "error": "evaluator_busy",
+                "message": str(e),
+                "step": step_name,
+                "deliverable": deliverable_name
+            }
+        )
     except Exception as e:
         error_detail = str(e)
         status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -150,6 +208,8 @@ async def evaluate_document(
         if "FAILED_PRECONDITION" in error_detail or "not in an ACTIVE state" in error_detail:
             status_code = status.HTTP_400_BAD_REQUEST
             error_detail = "The uploaded file could not be processed. Please try again with a different file."
+        else:
+            logger.exception("Evaluation failed for %s - %s", step_name, deliverable_name)
         
         raise HTTPException(
             status_code=status_code,
@@ -160,11 +220,83 @@ async def evaluate_document(
                 "deliverable": deliverable_name
             }
         )
-        
-    finally:
-        # Clean up the temporary file
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception as e:
-                print(f"Warning: Failed to delete temporary file {tmp_path}: {str(e)}")
+
+@router.post("/evaluate", response_model=EvaluationResponse, status_code=status.HTTP_200_OK)
+async def evaluate_document(
+    file: UploadFile = File(..., description="The file to evaluate"),
+    step_name: str = "",
+    deliverable_name: str = "",
+    additional_context: Optional[str] = None,
+    evaluator: GeminiDocEvaluator = Depends(get_evaluator)
+):
+    """
+    Evaluate a document, image, audio, or video file for a specific step and deliverable.
+    
+    This endpoint accepts various file types including documents (PDF, DOCX, etc.),
+    images (JPG, PNG, etc.), audio (MP3, WAV), and video (MP4, WebM, etc.) files.
+    
+    The evaluation will be performed based on the specified step and deliverable criteria.
+    """
+    return await _evaluate_one(file, step_name, deliverable_name, additional_context, evaluator)
+
+@router.post(
+    "/evaluate_batch",
+    response_model=list[Union[EvaluationResponse, EvaluationError]],
+    status_code=status.HTTP_200_OK
+)
+async def evaluate_batch(
+    files: list[UploadFile] = File(..., description="The files to evaluate"),
+    step_names: list[str] = Form(..., description="Step name for each file, in the same order"),
+    deliverable_names: list[str] = Form(..., description="Deliverable name for each file, in the same order"),
+    additional_context: Optional[str] = Form(None),
+    evaluator: GeminiDocEvaluator = Depends(get_evaluator)
+):
+    """
+    Evaluate several files in one request.
+    
+    Each file is paired with the step and deliverable name at the same position and the
+    evaluations run concurrently, up to MAX_CONCURRENT_GEMINI at a time. Results come
+    back in the same order as the files; a file that fails is reported in place with
+    its status code and error detail instead of failing the whole batch.
+    """
+    if not (len(files) == len(step_names) == len(deliverable_names)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": "mismatched_batch_fields",
+                "message": "'files', 'step_names' and 'deliverable_names' must have the same length",
+                "counts": {
+                    "files": len(files),
+                    "step_names": len(step_names),
+                    "deliverable_names": len(deliverable_names)
+                }
+            }
+        )
+    
+    # Queue the items so a batch never competes with itself for Gemini slots;
+    # only load from other requests can still turn an item away as busy
+    bound = asyncio.Semaphore(settings.MAX_CONCURRENT_GEMINI)
+    
+    async def run_one(file: UploadFile, step_name: str, deliverable_name: str) -> EvaluationResponse:
+        async with bound:
+            return await _evaluate_one(file, step_name, deliverable_name, additional_context, evaluator)
+    
+    results = await asyncio.gather(
+        *[run_one(f, s, d) for f, s, d in zip(files, step_names, deliverable_names)],
+        return_exceptions=True
+    )
+    
+    batch = []
+    for result, step_name, deliverable_name in zip(results, step_names, deliverable_names):
+        if isinstance(result, HTTPException):
+            batch.append(EvaluationError(
+                step_name=step_name,
+                deliverable_name=deliverable_name,
+                status_code=result.status_code,
+                detail=result.detail
+            ))
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            batch.append(result)
+    return batch
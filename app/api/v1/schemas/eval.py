@@ -1,11 +1,17 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Optional
 
 class EvaluationResponse(BaseModel):
     evaluation: str = Field(..., description="Detailed evaluation in markdown format with rubric-based scoring")
     step_name: str = Field(..., description="The name of the step being evaluated")
     deliverable_name: str = Field(..., description="The name of the deliverable being evaluated")
-    score: Optional[float] = Field(None, description="Numerical score based on the rubric (0-10)")
+    score: Optional[int] = Field(None, description="Numerical score based on the rubric (0-10)")
+
+class EvaluationError(BaseModel):
+    step_name: str = Field(..., description="The name of the step that was being evaluated")
+    deliverable_name: str = Field(..., description="The name of the deliverable that was being evaluated")
+    status_code: int = Field(..., description="HTTP status the same file would have produced on /evaluate")
+    detail: Any = Field(..., description="Error detail, in the same shape /evaluate returns")
 
 class EvaluationRequest(BaseModel):
     step_name: str = Field(..., description="The step name from the rubric (e.g., 'Research & Data Collection')")
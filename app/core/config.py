@@ -1,14 +1,23 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore"
+    )
+    
     PROJECT_NAME: str = "Project Evaluation"
     API_V1_STR: str = "/api/v1"
     GOOGLE_API_KEY: Optional[str] = None
-
-class config:
-    env_file = ".env"
-    env_file_encoding = "utf-8"
-    ignore_extra = True
+    # Browser origins allowed to call the API; override with a JSON list in the environment
+    ALLOWED_ORIGINS: list[str] = ["http://localhost:3000"]
+    # Worker threads for blocking evaluation work (hashing, reading files, long prompts)
+    GEMINI_UPLOAD_THREADS: int = 64
+    # Maximum number of evaluations talking to Gemini at once
+    MAX_CONCURRENT_GEMINI: int = 8
+    # Maximum number of files being uploaded to the Gemini Files API at once
+    GEMINI_MAX_CONCURRENT_UPLOADS: int = 32
 
 settings = Settings()
\ No newline at end of file
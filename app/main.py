@@ -1,29 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-
-# Environment variable loading
-load_dotenv()
-
+from fastapi.responses import ORJSONResponse
+from prometheus_client import make_asgi_app
 from app.core.config import settings
 from app.api.v1 import api_router_v1
+from app.services.project_doc import GeminiDocEvaluator
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One evaluator per process so every request shares the Gemini client and its connection pool
+    app.state.evaluator = evaluator = GeminiDocEvaluator()
+    await GeminiDocEvaluator.warmup()
+    sweeper = asyncio.create_task(evaluator.sweep_file_cache())
+    yield
+    sweeper.cancel()
+    # Let pending Gemini deletes finish before the connection pools close
+    await evaluator.shutdown()
+    await GeminiDocEvaluator.aclose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=settings.API_V1_STR
+    openapi_url=settings.API_V1_STR,
+    lifespan=lifespan,
+    # Evaluations carry several KB of markdown; orjson encodes them much faster than json
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware setup
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=settings.ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["POST", "GET"],
+    allow_headers=["Content-Type", "Authorization"],
+    # Let browsers cache preflight responses for a day
+    max_age=86400,
 )
 
 app.include_router(api_router_v1, prefix=settings.API_V1_STR)
 
+# Prometheus scrape endpoint for the Gemini phase timings
+app.mount("/metrics", make_asgi_app())
+
 @app.get("/")
 async def read_root():
     return {"message": f"Welcome to the {settings.PROJECT_NAME} API!"}
\ No newline at end of file
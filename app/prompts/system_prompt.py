@@ -1,128 +1,19 @@
-PROMPT = '''
-## 📊 EAD Assessment Rubrics
-
-### 🧩 Role 1 - Step 1: Research & Data Collection
-
-**Objective**: Gather real-world data related to the project using surveys and research.
-
-#### Rubric: Research & Data Collection
-
-| Criteria           | Excellent (10 pts)                                       | Good (7–9 pts)                              | Needs Improvement (4–6 pts)                  | Incomplete (0–3 pts)                         |
-|--------------------|----------------------------------------------------------|---------------------------------------------|----------------------------------------------|----------------------------------------------|
-| **Survey Structure**  | Clear, well-organized, no bias, diverse questions         | Mostly clear, some unclear wording           | Basic structure, lacks variety in questions   | Poorly structured, biased, or incomplete     |
-| **Data Collection**   | 10+ valid responses collected                            | 7–9 responses, mostly valid                  | 4–6 responses, some missing data              | Less than 4 responses, missing critical data |
-| **Research Depth**    | Uses credible sources, includes AI integration           | Good sources, some AI references             | Limited sources, minimal AI discussion        | No sources or AI discussion included         |
-
----
-
-### 📊 Role 1 - Step 2.1: Data Analysis & Visualization
-
-**Objective**: Organize and analyze collected data using charts and AI tools.
-
-#### Rubric: Data Analysis & Visualization
-
-| Criteria           | Excellent (10 pts)                               | Good (7–9 pts)                         | Needs Improvement (4–6 pts)             | Incomplete (0–3 pts)                    |
-|--------------------|--------------------------------------------------|----------------------------------------|------------------------------------------|------------------------------------------|
-| **Data Organization** | Data is structured, accurate, and complete       | Mostly structured, minor errors         | Some organization issues, missing elements | Disorganized, missing major parts        |
-| **Visualization**     | Graphs/charts are clear, well-labeled, insightful | Mostly clear, lacks full explanation    | Basic graphs, limited insight             | No graphs, unclear or missing labels     |
-| **Analysis Quality**  | Identifies trends, includes AI insights          | Identifies trends, some AI integration | Basic description, no AI insight          | No analysis, data left unexplained       |
-
----
-
-### 🎨 Role 1 (Optional) - Step 2.2: User Interface (UI) Design
-
-**Objective**: Design the user interface of the AI assistant using Figma.
-
-#### Rubric: UI/UX Design
-
-| Criteria             | Excellent (10 pts)                         | Good (7–9 pts)                          | Needs Improvement (4–6 pts)         | Incomplete (0–3 pts)                    |
-|----------------------|--------------------------------------------|-----------------------------------------|--------------------------------------|------------------------------------------|
-| **Wireframe Design** | UI well-structured, follows best practices | Mostly clear but some UI issues         | Basic layout, lacks usability         | No wireframe or unclear layout           |
-| **User Experience**  | Intuitive, easy-to-use navigation          | Mostly clear, needs minor improvements  | Some confusing UI elements           | Poorly structured, difficult to use      |
-| **Usability Testing**| Feedback collected, applied improvements   | Some usability feedback incorporated    | Limited feedback, minimal changes    | No usability test performed              |
-
----
-
-### 🤖 Role 2 - Step 3: AI Development & Coding
-
-**Objective**: Build an AI-powered prototype or chatbot for recycling assistance.
-
-#### Rubric: AI Development & Coding
-
-| Criteria               | Excellent (10 pts)                           | Good (7–9 pts)                          | Needs Improvement (4–6 pts)         | Incomplete (0–3 pts)                    |
-|------------------------|----------------------------------------------|-----------------------------------------|--------------------------------------|------------------------------------------|
-| **AI Logic & Functionality** | Fully functional, handles multiple inputs | Mostly functional, some errors          | Basic function, lacks dynamic responses | Non-functional or incomplete code     |
-| **Coding Structure**       | Well-organized, follows best practices     | Mostly structured, minor redundancies   | Some structure, inefficient code       | Poorly structured, lacks clarity        |
-| **Debugging & Refinement** | Errors fixed, AI accuracy optimized        | Some minor bugs remain                  | Some debugging attempted               | No debugging, significant errors remain |
-
----
-
-### 🧠 Role 2 - Step 4: Generative AI Development & Fine-Tuning
-
-**Objective**: Build a functional generative AI tool using platforms like ChatGPT, LangChain, or Claude, and optimize its performance.
-
-#### Rubric: Generative AI Development
-
-| Criteria             | Excellent (10 pts)                                                | Good (7–9 pts)                            | Needs Improvement (4–6 pts)          | Incomplete (0–3 pts)                    |
-|----------------------|-------------------------------------------------------------------|-------------------------------------------|----------------------------------------|------------------------------------------|
-| **Functionality**    | AI tool works flawlessly, handles complex queries, uses advanced features | Mostly functional, limited to basic inputs/outputs | Partial functionality; significant errors | Non-functional or missing components   |
-| **Prompt Engineering**| Clear, iterative prompt refinement with documented improvements     | Basic prompt tuning, lacks depth         | Minimal adjustments; no documentation  | No prompt optimization attempted         |
-| **User Testing**     | 5+ test cases with feedback and fixes                              | 3–4 test cases, some feedback applied     | 1–2 test cases, no iteration            | No testing conducted                     |
-| **Innovation**       | Unique use case with creative AI interactions                      | Practical but conventional application    | Derivative idea, lacks originality      | No clear purpose or innovation           |
-
----
-
-### 🌍 Role 3 - Step 5: Branding & Community Engagement
-
-**Objective**: Develop branding materials and promote the AI assistant.
-
-#### Rubric: Branding & Community Engagement
-
-| Criteria               | Excellent (10 pts)                            | Good (7–9 pts)                             | Needs Improvement (4–6 pts)       | Incomplete (0–3 pts)                    |
-|------------------------|-----------------------------------------------|--------------------------------------------|------------------------------------|------------------------------------------|
-| **Branding Consistency** | Logo, colors, and messaging are aligned        | Mostly consistent, minor adjustments needed | Basic branding, lacks cohesion     | No branding materials included           |
-| **Social Media Promotion**| Engaging, well-designed campaign              | Mostly clear, minor visual issues           | Basic design, lacks engagement     | No social media promotion created        |
-| **Community Interaction** | Reached audience and collected feedback       | Some engagement, basic feedback             | Limited engagement, no feedback   | No promotion or engagement               |
-
----
-
-### 🎤 Role 3 - Step 6: Final Presentation & Reflection
-
-**Objective**: Present the AI assistant, insights, and learning reflections.
-
-#### Rubric: Final Presentation & Reflection
-
-| Criteria               | Excellent (10 pts)                            | Good (7–9 pts)                             | Needs Improvement (4–6 pts)       | Incomplete (0–3 pts)                    |
-|------------------------|-----------------------------------------------|--------------------------------------------|------------------------------------|------------------------------------------|
-| **Presentation Structure** | Clear, well-organized, engaging visuals       | Mostly clear, some structural issues        | Basic slides, lacks flow           | Poorly structured, minimal effort        |
-| **Delivery & Speaking Skills**| Confident, clear speech, interactive       | Mostly clear, minor hesitations             | Needs more confidence, lacks clarity | Unclear delivery, minimal engagement  |
-| **Reflection Depth**    | Thoughtful analysis, strong learning points    | Good insights, could be deeper              | Basic reflections, lacks depth     | No reflection, minimal engagement        |
-
----
-
-## 🧠 SYSTEM PROMPT INSTRUCTION FOR MODEL
-
-You are an expert evaluator designed to assess student or team project submissions based on the **EAD Assessment Rubrics** provided above.
-
-You will be given a document (such as a research report, code summary, branding pitch, UI design, or final reflection). Your job is to:
-
-1. **Identify which rubric(s)** from the above apply to the document.
-2. **Evaluate the content** by comparing it directly to the criteria of the appropriate rubric.
-3. For the only applicable rubric, provide:
-   - A short **justification** for the score you assign to each criterion.
-   - A **final score** (out of 10) for each criterion.
-4. **Reference** the rubric explicitly in your response. For example:  
-   _“Based on the **AI Development & Coding** rubric, the AI assistant was mostly functional with some errors, so it earns 8/10 under ‘AI Logic & Functionality’.”_
-5. Do not evaluate anything outside the rubrics. Select only the one which applies. 
-6. Be objective, detailed, and clear in your scoring.
-7. Output format must follow this structure for each section:
-
-### Evaluation: \\[Rubric Name\\]
-
-* Criterion: \\[Your evaluation and score\\]
-* Final Scores: \\[Total or per criterion\\]
-* Strengths, Weeknes, Improvements etc (Be detailed)
-
-
-Your goal is to help students understand their performance clearly, based strictly on the given rubrics.
-'''
+import functools
+import mmap
+import pathlib
+
+# The rubric text lives next to this module as markdown so it isn't parsed
+# and held by every worker at import time.
+_PATH = pathlib.Path(__file__).with_suffix('.md')
+
+@functools.cache
+def _load() -> str:
+    """Read the system prompt from disk through a read-only shared mapping."""
+    with _PATH.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm[:].decode('utf-8')
+
+def __getattr__(name: str) -> str:
+    # Resolve PROMPT lazily so importing the module costs nothing
+    if name == 'PROMPT':
+        return _load()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,147 +1,150 @@
 from google import genai
 from google.genai import types
+from cachetools import TTLCache
+from prometheus_client import Histogram
+import httpx
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import functools
+import hashlib
+import io
+import logging
+import mimetypes
 import os
-from typing import Optional
+import socket
+from collections import Counter
+from typing import Callable, Optional, Union
+from app.core.config import settings
 
-class GeminiDocEvaluator:
-    def __init__(self):
-        self.client = genai.Client()
+logger = logging.getLogger(__name__)
 
-    async def evaluate(
-        self, 
-        file_path: str, 
-        step_name: str,
-        deliverable_name: str,
-        additional_context: Optional[str] = None,
-        model: str = "gemini-2.5-flash"
-    ) -> str:
-        """
-        Evaluate a file based on the specified step and deliverable criteria.
-        
-        Args:
-            file_path: Path to the file to evaluate
-            step_name: Name of the step being evaluated (e.g., 'Research & Data Collection')
-            deliverable_name: Name of the deliverable being evaluated (e.g., 'Survey Results')
-            additional_context: Any additional context about the submission
-            model: The Gemini model to use for evaluation
-            
-        Returns:
-            str: The evaluation result in markdown format
-            
-        Raises:
-            Exception: If file upload or evaluation fails
-        """
-        loop = asyncio.get_event_loop()
-        myfile = None
-        
-        try:
-            # 1. Verify file exists and is readable
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"File not found: {file_path}")
-                
-            # 2. Upload file asynchronously with retry and wait for processing
-            max_retries = 3
-            retry_delay = 2  # seconds
-            max_processing_time = 30  # Maximum time to wait for processing (seconds)
-            
-            for attempt in range(max_retries):
-                try:
-                    # Upload the file
-                    myfile = await loop.run_in_executor(
-                        None, 
-                        lambda: self.client.files.upload(file=file_path)
-                    )
-                    
-                    if not hasattr(myfile, 'state'):
-                        # If state isn't available, assume it's ready
-                        break
-                        
-                    # Wait for the file to be processed
-                    start_time = asyncio.get_event_loop().time()
-                    while myfile.state == 'PROCESSING':
-                        if (asyncio.get_event_loop().time() - start_time) > max_processing_time:
-                            raise Exception(f"File processing timed out after {max_processing_time} seconds")
-                        await asyncio.sleep(retry_delay)
-                        
-                        # Refresh file status
-                        myfile = await loop.run_in_executor(
-                            None,
-                            lambda: self.client.files.get(name=myfile.name)
-                        )
-                    
-                    if myfile.state != 'ACTIVE':
-                        raise Exception(f"File is not in ACTIVE state after upload. State: {myfile.state}")
-                        
-                    break  # Success, exit retry loop
-                    
-                except Exception as e:
-                    if attempt == max_retries - 1:  # Last attempt
-                        # If we have a file handle, try to clean it up
-                        if 'myfile' in locals() and hasattr(myfile, 'name'):
-                            try:
-                                await loop.run_in_executor(
-                                    None,
-                                    lambda: self.client.files.delete(name=myfile.name)
-                                )
-                            except:
-                                pass  # Ignore cleanup errors
-                        raise Exception(f"Failed to upload file after {max_retries} attempts: {str(e)}")
-                    
-                    await asyncio.sleep(retry_delay * (attempt + 1))  # Exponential backoff
-            
-            if not myfile:
-                raise Exception("File upload failed: No file handle returned")
-            
-            # 3. Create evaluation prompt
-            evaluation_prompt = self._create_evaluation_prompt(
-                step_name=step_name,
-                deliverable_name=deliverable_name,
-                additional_context=additional_context
-            )
-            
-            # 4. Generate content asynchronously with error handling
-            def generate():
-                try:
-                    return self.client.models.generate_content(
-                        model=model,
-                        contents=[evaluation_prompt, myfile]
-                    )
-                except Exception as e:
-                    raise Exception(f"Content generation failed: {str(e)}")
-            
-            response = await loop.run_in_executor(None, generate)
-            
-            if not response or not hasattr(response, 'text'):
-                raise Exception("Invalid response from Gemini API")
-                
-            return response.text
-            
-        except Exception as e:
-            raise Exception(f"Evaluation failed: {str(e)}")
-            
-        finally:
-            # 5. Clean up: Delete the file from Gemini if it was uploaded
-            if myfile and hasattr(myfile, 'name'):
-                try:
-                    await loop.run_in_executor(
-                        None, 
-                        lambda: self.client.files.delete(name=myfile.name)
-                    )
-                except Exception as cleanup_error:
-                    # Log the error but don't fail the main operation
-                    print(f"Warning: Failed to delete uploaded file: {str(cleanup_error)}")
+# Gemini keeps uploaded files for 48h; stay well inside that
+FILE_CACHE_SIZE = 256
+FILE_CACHE_TTL = 3500  # seconds
+
+# Distinct (step, deliverable) pairs whose rendered prompt is kept
+PROMPT_CACHE_SIZE = 256
+# Additional context longer than this is formatted off the event loop
+PROMPT_OFFLOAD_CONTEXT_CHARS = 4096
+
+# Content type that says nothing about the file; treated like a missing one
+GENERIC_MIME_TYPE = "application/octet-stream"
+
+# Files up to this size are sent inline with generate_content instead of through
+# the Files API. Inline data is base64 encoded and the whole request must stay
+# under Gemini's 20MB limit, so leave room for the encoding overhead and the prompt.
+INLINE_MAX_BYTES = 14 * 1024 * 1024
+
+# How long a request may wait for a free Gemini slot before it is turned away
+SLOT_ACQUIRE_TIMEOUT = 0.5  # seconds
+# Upper bound on a single generate_content call so a stuck request doesn't pin a worker
+GENERATE_TIMEOUT = 30  # seconds
+
+# Polling schedule while an uploaded file is PROCESSING
+POLL_INITIAL_DELAY = 0.1  # seconds
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 2.0  # seconds
+
+# Longest startup waits on the warmup call before giving up on it
+WARMUP_TIMEOUT = 5  # seconds
+
+# Connection pool shared by every Gemini request (upload, get, generate, delete)
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 50
+# Keep idle connections (and their TLS sessions) around between bursts of requests
+KEEPALIVE_EXPIRY = 120  # seconds
+# Probe idle sockets well before KEEPALIVE_EXPIRY; the OS default waits two hours
+TCP_KEEPALIVE_IDLE = 30  # seconds
+TCP_KEEPALIVE_INTERVAL = 10  # seconds
+TCP_KEEPALIVE_PROBES = 3
+
+# Hashing, file reads and long-context prompts run here rather than on the default
+# executor, whose min(32, cpu + 4) workers would cap concurrent evaluations
+UPLOAD_EXECUTOR = ThreadPoolExecutor(
+    max_workers=settings.GEMINI_UPLOAD_THREADS,
+    thread_name_prefix="gemini-io"
+)
+
+# Per-phase latency of the Gemini calls, exported on /metrics
+_FAST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+# Covers the upload itself, the wait for ACTIVE (up to 30s per attempt) and retry
+# sleeps, so large files and video need buckets well past the fast range
+UPLOAD_SECONDS = Histogram(
+    'gemini_upload_seconds',
+    'Time to upload a file to Gemini and wait until it is ACTIVE',
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+)
+GENERATE_SECONDS = Histogram(
+    'gemini_generate_seconds',
+    'Time spent in generate_content',
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60)
+)
+DELETE_SECONDS = Histogram(
+    'gemini_delete_seconds',
+    'Time to delete an uploaded file from Gemini',
+    buckets=_FAST_BUCKETS
+)
+
+# Strong references to background deletes so they aren't garbage collected mid-flight
+_CLEANUP_TASKS: set[asyncio.Task] = set()
+
+class EvaluatorBusyError(Exception):
+    """Raised when every Gemini slot stays taken for longer than SLOT_ACQUIRE_TIMEOUT."""
+
+class _UploadedFileCache(TTLCache):
+    """TTLCache that reports every expired or evicted entry to on_evict."""
     
-    def _create_evaluation_prompt(self, step_name: str, deliverable_name: str, additional_context: Optional[str] = None) -> str:
-        """Create a detailed prompt for evaluation based on the step and deliverable."""
-        base_prompt = f"""
+    def __init__(self, maxsize: int, ttl: float, on_evict: Callable[[types.File], None]):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._on_evict = on_evict
+    
+    def expire(self, time=None):
+        # Relies on expire() returning the expired items (cachetools >= 5.5)
+        expired = super().expire(time)
+        for _, myfile in expired:
+            self._on_evict(myfile)
+        return expired
+    
+    def popitem(self):
+        key, myfile = super().popitem()
+        self._on_evict(myfile)
+        return key, myfile
+    
+    def clear(self):
+        # TTLCache.clear() bypasses popitem() on newer cachetools, so drain every
+        # entry through expire() to report each one
+        self.expire(float("inf"))
+
+def _content_digest(upload_file: Union[str, io.IOBase]) -> str:
+    """SHA-256 of a file path or a seekable binary stream."""
+    if isinstance(upload_file, str):
+        with open(upload_file, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+    upload_file.seek(0)
+    digest = hashlib.file_digest(upload_file, 'sha256').hexdigest()
+    upload_file.seek(0)
+    return digest
+
+def _read_content(upload_file: Union[str, io.IOBase]) -> bytes:
+    """Whole contents of a file path or a seekable binary stream."""
+    if isinstance(upload_file, str):
+        with open(upload_file, 'rb') as f:
+            return f.read()
+    upload_file.seek(0)
+    data = upload_file.read()
+    upload_file.seek(0)
+    return data
+
+# Evaluation prompt pieces. The indentation inside these literals is part of the
+# text sent to Gemini, so it is kept exactly as written.
+_HEADER_TEMPLATE = """
         You are an expert evaluator for the EAD (Early Age Development) project assessment.
         
         **TASK**: Evaluate the provided submission based on the following criteria:
-        - Step: {step_name}
-        - Deliverable: {deliverable_name}
+        - Step: {step}
+        - Deliverable: {deliv}
         
-        {f"**Additional Context**: {additional_context}" if additional_context else ""}
+        {ctx}
         
         **INSTRUCTIONS**:
         1. Focus ONLY on the specific step and deliverable mentioned above.
@@ -153,7 +156,7 @@ class GeminiDocEvaluator:
         **REQUIRED RESPONSE FORMAT**:
         Your evaluation MUST follow this exact format:
         
-        ## Evaluation for {step_name} - {deliverable_name}
+        ## Evaluation for {step} - {deliv}
         
         ### 📋 Overview
         [Brief 2-3 sentence summary of the submission]
@@ -178,13 +181,16 @@ class GeminiDocEvaluator:
         ### 🔢 Overall Score: [X]/30
         [Brief justification for the overall score based on rubric criteria]
         
-        **RUBRIC FOR {step_name}**:
+        **RUBRIC FOR {step}**:
         
         """
-        
-        # Add the appropriate rubric table based on the step_name
-        if "Research & Data Collection" in step_name:
-            base_prompt += """
+
+# The additional context is the only per-request part of the header
+_HEADER_HEAD, _HEADER_TAIL = _HEADER_TEMPLATE.split("{ctx}")
+
+# Rubric per step, matched against the step name by _select_rubric
+_RUBRICS: dict[str, str] = {
+    "Research & Data Collection": """
             #### Rubric: Research & Data Collection
             
             | Criteria           | Excellent (10 pts) | Good (7–9 pts) | Needs Improvement (4–6 pts) | Incomplete (0–3 pts) | Score |
@@ -195,9 +201,8 @@ class GeminiDocEvaluator:
             
             **Total Score**: [23]/30
             **Overall Rating**: [Good] (Scores: 7-9 = Good)
-            """
-        elif "Data Analysis & Visualization" in step_name:
-            base_prompt += """
+            """,
+    "Data Analysis & Visualization": """
             #### Rubric: Data Analysis & Visualization
             
             | Criteria           | Excellent (10 pts) | Good (7–9 pts) | Needs Improvement (4–6 pts) | Incomplete (0–3 pts) | Score |
@@ -208,9 +213,8 @@ class GeminiDocEvaluator:
             
             **Total Score**: [26]/30
             **Overall Rating**: [Very Good] (Scores: 24-30 = Excellent, 18-23 = Good, 12-17 = Needs Improvement, 0-11 = Incomplete)
-            """
-        elif "UI Design" in step_name:
-            base_prompt += """
+            """,
+    "UI Design": """
             #### Rubric: UI/UX Design
             
             | Criteria           | Excellent (10 pts) | Good (7–9 pts) | Needs Improvement (4–6 pts) | Incomplete (0–3 pts) | Score |
@@ -222,9 +226,10 @@ class GeminiDocEvaluator:
             **Total Score**: [24]/30
             **Overall Rating**: [Good] (Scores: 24-30 = Excellent, 18-23 = Good, 12-17 = Needs Improvement, 0-11 = Incomplete)
             """
-        else:
-            # Default rubric for other steps
-            base_prompt += """
+}
+
+# Rubric for any other step
+_DEFAULT_RUBRIC = """
             #### Rubric: General Assessment
             
             | Criteria           | Excellent (10 pts) | Good (7–9 pts) | Needs Improvement (4–6 pts) | Incomplete (0–3 pts) | Score |
@@ -236,8 +241,8 @@ class GeminiDocEvaluator:
             **Total Score**: [23]/30
             **Overall Rating**: [Good] (Scores: 24-30 = Excellent, 18-23 = Good, 12-17 = Needs Improvement, 0-11 = Incomplete)
             """
-        
-        base_prompt += """
+
+_FOOTER = """
         
         **EVALUATION INSTRUCTIONS**:
         1. Carefully review the submission against the rubric criteria for the specified step.
@@ -250,5 +255,549 @@ class GeminiDocEvaluator:
         **IMPORTANT**: Only evaluate based on the specified step and deliverable. If the submission contains
         information about other steps or deliverables, ignore that content in your evaluation.
         """
+
+# Normalized step name -> rubric, so canonical step names cost one dict lookup
+_RUBRIC_LOOKUP = {name.lower(): text for name, text in _RUBRICS.items()}
+
+def _match_fuzzy(key: str) -> str:
+    """Pick the first rubric whose step name appears anywhere in key."""
+    return next((text for name, text in _RUBRIC_LOOKUP.items() if name in key), _DEFAULT_RUBRIC)
+
+def _select_rubric(step_name: str) -> str:
+    """Return the rubric for step_name, ignoring case and surrounding whitespace."""
+    key = step_name.strip().lower()
+    return _RUBRIC_LOOKUP.get(key) or _match_fuzzy(key)
+
+class GeminiDocEvaluator:
+    # One client (and one pair of connection pools) shared by every evaluator
+    _shared_client: Optional[genai.Client] = None
+    _transports: tuple = ()
+    # Bounds concurrent Files API uploads across evaluators; created on first use
+    _upload_sem: Optional[asyncio.Semaphore] = None
+    
+    def __init__(self):
+        self.client = self._get_client()
+        # Content digest -> uploaded Gemini file, so re-evaluating the same
+        # submission skips the upload entirely
+        self._file_cache = _UploadedFileCache(
+            maxsize=FILE_CACHE_SIZE,
+            ttl=FILE_CACHE_TTL,
+            on_evict=self._on_file_evicted
+        )
+        # Caps in-flight Gemini work so quota saturation doesn't turn into wasted uploads
+        self._sem = asyncio.Semaphore(settings.MAX_CONCURRENT_GEMINI)
+        # Gemini file name -> requests currently generating over it. Expired or evicted
+        # files that are still leased are parked in _retired until the last one finishes.
+        self._leases: Counter[str] = Counter()
+        self._retired: set[str] = set()
+
+    async def evaluate(
+        self, 
+        file_path: str, 
+        step_name: str,
+        deliverable_name: str,
+        additional_context: Optional[str] = None,
+        model: str = "gemini-2.5-flash"
+    ) -> str:
+        """
+        Evaluate a file based on the specified step and deliverable criteria.
+        
+        Args:
+            file_path: Path to the file to evaluate
+            step_name: Name of the step being evaluated (e.g., 'Research & Data Collection')
+            deliverable_name: Name of the deliverable being evaluated (e.g., 'Survey Results')
+            additional_context: Any additional context about the submission
+            model: The Gemini model to use for evaluation
+            
+        Returns:
+            str: The evaluation result in markdown format
+            
+        Raises:
+            Exception: If file upload or evaluation fails
+        """
+        return await self._run_evaluation(
+            upload_file=file_path,
+            upload_config=None,
+            step_name=step_name,
+            deliverable_name=deliverable_name,
+            additional_context=additional_context,
+            model=model
+        )
+    
+    async def evaluate_stream(
+        self,
+        stream: io.IOBase,
+        mime_type: Optional[str],
+        step_name: str,
+        deliverable_name: str,
+        additional_context: Optional[str] = None,
+        display_name: Optional[str] = None,
+        model: str = "gemini-2.5-flash"
+    ) -> str:
+        """
+        Evaluate a seekable binary stream without writing it to disk first.
+        
+        Args:
+            stream: Seekable binary stream holding the file contents
+            mime_type: MIME type of the file; guessed from display_name when omitted or generic
+            step_name: Name of the step being evaluated (e.g., 'Research & Data Collection')
+            deliverable_name: Name of the deliverable being evaluated (e.g., 'Survey Results')
+            additional_context: Any additional context about the submission
+            display_name: Original file name shown in the Gemini Files API
+            model: The Gemini model to use for evaluation
+            
+        Returns:
+            str: The evaluation result in markdown format
+            
+        Raises:
+            Exception: If file upload or evaluation fails
+        """
+        # Clients often send octet-stream for .md, .docx, .mkv and the like, which
+        # Gemini rejects; the extension is the better signal then
+        if (not mime_type or mime_type == GENERIC_MIME_TYPE) and display_name:
+            mime_type = mimetypes.guess_type(display_name)[0] or mime_type
+        upload_config = types.UploadFileConfig(
+            mime_type=mime_type,
+            display_name=display_name
+        )
+        return await self._run_evaluation(
+            upload_file=stream,
+            upload_config=upload_config,
+            step_name=step_name,
+            deliverable_name=deliverable_name,
+            additional_context=additional_context,
+            model=model
+        )
+    
+    async def evaluate_many(
+        self,
+        jobs: list[dict],
+        concurrency: Optional[int] = None
+    ) -> list[Union[str, Exception]]:
+        """
+        Evaluate several files concurrently.
+        
+        Args:
+            jobs: Keyword arguments for evaluate(), one dict per file
+            concurrency: Maximum number of jobs in flight; defaults to MAX_CONCURRENT_GEMINI
+            
+        Returns:
+            list: The evaluation text, or the exception raised, for each job in order
+        """
+        # Jobs beyond the bound queue here so the batch never competes with itself
+        # for slots. Each job still waits at most SLOT_ACQUIRE_TIMEOUT for a shared
+        # slot, so other traffic holding them can fail it with EvaluatorBusyError.
+        bound = asyncio.Semaphore(concurrency or settings.MAX_CONCURRENT_GEMINI)
+        
+        async def run(job: dict) -> str:
+            async with bound:
+                return await self.evaluate(**job)
+        
+        return await asyncio.gather(*(run(job) for job in jobs), return_exceptions=True)
+    
+    async def evaluate_batch(
+        self,
+        file_path: str,
+        jobs: list[tuple[str, str, Optional[str]]],
+        model: str = "gemini-2.5-flash"
+    ) -> list[Union[str, Exception]]:
+        """
+        Evaluate one file against several steps and deliverables, uploading it only once.
+        
+        Args:
+            file_path: Path to the file to evaluate
+            jobs: (step_name, deliverable_name, additional_context) for each evaluation
+            model: The Gemini model to use for evaluation
+            
+        Returns:
+            list: The evaluation text, or the exception raised, for each job in order
+            
+        Raises:
+            Exception: If the file can't be read or uploaded
+        """
+        return await self._run_jobs(
+            upload_file=file_path,
+            upload_config=None,
+            jobs=jobs,
+            model=model
+        )
+    
+    async def _run_evaluation(
+        self,
+        upload_file: Union[str, io.IOBase],
+        upload_config: Optional[types.UploadFileConfig],
+        step_name: str,
+        deliverable_name: str,
+        additional_context: Optional[str],
+        model: str
+    ) -> str:
+        """Shared body of evaluate() and evaluate_stream()."""
+        result, = await self._run_jobs(
+            upload_file=upload_file,
+            upload_config=upload_config,
+            jobs=[(step_name, deliverable_name, additional_context)],
+            model=model
+        )
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    async def _run_jobs(
+        self,
+        upload_file: Union[str, io.IOBase],
+        upload_config: Optional[types.UploadFileConfig],
+        jobs: list[tuple[str, str, Optional[str]]],
+        model: str
+    ) -> list[Union[str, Exception]]:
+        """Prepare the file once, then generate an evaluation for every job over it.
+        
+        One Gemini slot admits the batch and covers preparing the content; every
+        generate then runs in a slot of its own.
+        """
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=SLOT_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise EvaluatorBusyError("Too many evaluations in progress, please try again shortly")
+        holding_slot = True
+        
+        try:
+            # 1. Verify the file exists and has content before spending an upload on it
+            if isinstance(upload_file, str):
+                try:
+                    file_size = os.stat(upload_file).st_size
+                except FileNotFoundError:
+                    raise FileNotFoundError(f"File not found: {upload_file}")
+                if file_size == 0:
+                    raise ValueError(f"File is empty: {upload_file}")
+                mime_type = mimetypes.guess_type(upload_file)[0]
+            else:
+                file_size = upload_file.seek(0, io.SEEK_END)
+                upload_file.seek(0)
+                mime_type = upload_config.mime_type if upload_config else None
+            
+            # 2. Build the prompts while the content is read inline (small files)
+            # or hashed and uploaded to the Files API
+            if file_size <= INLINE_MAX_BYTES and mime_type:
+                prepare_content = self._read_inline(upload_file, mime_type)
+            else:
+                prepare_content = self._upload_and_wait(upload_file, upload_config)
+            prepared, *evaluation_prompts = await asyncio.gather(
+                prepare_content,
+                *(self._build_prompt(*job) for job in jobs),
+                return_exceptions=True
+            )
+            if isinstance(prepared, BaseException):
+                raise prepared
+            digest, content = prepared
+            
+            try:
+                for prompt in evaluation_prompts:
+                    if isinstance(prompt, BaseException):
+                        raise prompt
+                
+                # 3. Generate every evaluation over the same content. Each generate
+                # takes its own slot so a large batch stays within MAX_CONCURRENT_GEMINI;
+                # the admission slot goes back first so waiting batches can't deadlock.
+                self._sem.release()
+                holding_slot = False
+                results = await asyncio.gather(
+                    *(self._generate_in_slot(content, prompt, model) for prompt in evaluation_prompts),
+                    return_exceptions=True
+                )
+                if digest is not None and all(isinstance(r, Exception) for r in results):
+                    # Stop handing the file out; it is deleted once no request uses it.
+                    # Sweep first so an expired entry is retired by the eviction hook
+                    # and only a file we actually remove is retired here.
+                    self._file_cache.expire()
+                    if self._file_cache.get(digest) is content:
+                        self._file_cache.pop(digest)
+                        self._retire_file(content.name)
+                
+                return results
+            
+            finally:
+                if digest is not None:
+                    self._release_file(content.name)
+            
+        finally:
+            if holding_slot:
+                self._sem.release()
+    
+    async def _build_prompt(
+        self,
+        step_name: str,
+        deliverable_name: str,
+        additional_context: Optional[str]
+    ) -> str:
+        """Build the prompt on the loop, or on a worker thread when the context is long."""
+        if additional_context and len(additional_context) > PROMPT_OFFLOAD_CONTEXT_CHARS:
+            return await asyncio.get_running_loop().run_in_executor(
+                UPLOAD_EXECUTOR,
+                self._create_evaluation_prompt,
+                step_name,
+                deliverable_name,
+                additional_context
+            )
+        # The rest of the prompt is cached, so this is a couple of short joins
+        return self._create_evaluation_prompt(step_name, deliverable_name, additional_context)
+    
+    async def _upload_and_wait(
+        self,
+        upload_file: Union[str, io.IOBase],
+        upload_config: Optional[types.UploadFileConfig]
+    ) -> tuple[str, types.File]:
+        """Return the content digest and an ACTIVE Gemini file holding that content.
+        
+        Files are reused from earlier uploads of the same content; new uploads are
+        cached right away and stay on Gemini until their entry expires or is evicted.
+        The returned file is leased to the caller, who must pass it to _release_file.
+        """
+        digest = await asyncio.get_running_loop().run_in_executor(
+            UPLOAD_EXECUTOR, _content_digest, upload_file
+        )
+        myfile = self._file_cache.get(digest)
+        if myfile is None:
+            with UPLOAD_SECONDS.time():
+                myfile = await self._upload(upload_file, upload_config)
+            existing = self._file_cache.get(digest)
+            if existing is not None:
+                # A concurrent request cached the same content first
+                self._retire_file(myfile.name)
+                myfile = existing
+            else:
+                self._file_cache[digest] = myfile
+        # Taken before the next await so an eviction can't delete the file underneath us
+        self._leases[myfile.name] += 1
+        return digest, myfile
+    
+    async def _read_inline(self, upload_file: Union[str, io.IOBase], mime_type: str) -> tuple[None, types.Part]:
+        """Read a small file into an inline part, skipping the Files API entirely.
+        
+        Returns None in place of a digest since nothing is uploaded or cached.
+        """
+        data = await asyncio.get_running_loop().run_in_executor(
+            UPLOAD_EXECUTOR, _read_content, upload_file
+        )
+        return None, types.Part.from_bytes(data=data, mime_type=mime_type)
+    
+    async def _generate_in_slot(self, content: Union[types.File, types.Part], evaluation_prompt: str, model: str) -> str:
+        """Run _generate while holding one of the evaluator's Gemini slots."""
+        async with self._sem:
+            return await self._generate(content, evaluation_prompt, model)
+    
+    async def _generate(self, content: Union[types.File, types.Part], evaluation_prompt: str, model: str) -> str:
+        """Generate the evaluation text for an uploaded file or an inline part."""
+        with GENERATE_SECONDS.time():
+            response = await self.client.aio.models.generate_content(
+                model=model,
+                contents=[evaluation_prompt, content],
+                config=types.GenerateContentConfig(
+                    http_options=types.HttpOptions(timeout=GENERATE_TIMEOUT * 1000)
+                )
+            )
+        
+        if not response or not hasattr(response, 'text'):
+            raise Exception("Invalid response from Gemini API")
+        
+        return response.text
+    
+    async def _upload(
+        self,
+        upload_file: Union[str, io.IOBase],
+        upload_config: Optional[types.UploadFileConfig]
+    ) -> types.File:
+        """Upload a file to Gemini and wait until it is ACTIVE."""
+        loop = asyncio.get_running_loop()
+        myfile = None
+        
+        # Upload file with retry and wait for processing
+        max_retries = 3
+        retry_delay = 2  # seconds
+        max_processing_time = 30  # Maximum time to wait for processing (seconds)
+        
+        for attempt in range(max_retries):
+            try:
+                # Upload the file, rewinding buffers left mid-read by a failed attempt
+                if not isinstance(upload_file, str):
+                    upload_file.seek(0)
+                async with self._get_upload_sem():
+                    myfile = await self.client.aio.files.upload(file=upload_file, config=upload_config)
+                
+                if not hasattr(myfile, 'state'):
+                    # If state isn't available, assume it's ready
+                    break
+                    
+                # Wait for the file to be processed, polling quickly at first and
+                # backing off only while it stays in PROCESSING
+                name = myfile.name
+                deadline = loop.time() + max_processing_time
+                poll_delay = POLL_INITIAL_DELAY
+                while myfile.state == 'PROCESSING':
+                    if loop.time() > deadline:
+                        raise Exception(f"File processing timed out after {max_processing_time} seconds")
+                    await asyncio.sleep(poll_delay)
+                    poll_delay = min(poll_delay * POLL_BACKOFF, POLL_MAX_DELAY)
+                    
+                    # Refresh file status
+                    myfile = await self.client.aio.files.get(name=name)
+                
+                if myfile.state != 'ACTIVE':
+                    raise Exception(f"File is not in ACTIVE state after upload. State: {myfile.state}")
+                    
+                break  # Success, exit retry loop
+                
+            except Exception as e:
+                # Clean up the failed attempt's file so retries don't leave it behind
+                if myfile is not None and getattr(myfile, 'name', None):
+                    self._schedule_delete(myfile.name)
+                    myfile = None
+                if attempt == max_retries - 1:  # Last attempt
+                    raise RuntimeError(f"Failed to upload file after {max_retries} attempts: {str(e)}") from e
+                
+                await asyncio.sleep(retry_delay * (attempt + 1))  # Exponential backoff
+        
+        if not myfile:
+            raise Exception("File upload failed: No file handle returned")
+        
+        return myfile
+    
+    async def _delete_file(self, name: str) -> None:
+        """Delete an uploaded file from Gemini, ignoring failures."""
+        try:
+            with DELETE_SECONDS.time():
+                await self.client.aio.files.delete(name=name)
+        except Exception as cleanup_error:
+            # Log the error but don't fail the main operation
+            logger.warning("Failed to delete uploaded file %s: %r", name, cleanup_error)
+    
+    def _schedule_delete(self, name: str) -> None:
+        """Delete an uploaded file in the background; nothing waits on server-side cleanup."""
+        task = asyncio.create_task(self._delete_file(name))
+        _CLEANUP_TASKS.add(task)
+        task.add_done_callback(_CLEANUP_TASKS.discard)
+    
+    def _retire_file(self, name: str) -> None:
+        """Delete a Gemini file now, or once the last request using it has finished."""
+        if self._leases[name]:
+            self._retired.add(name)
+        else:
+            self._schedule_delete(name)
+    
+    def _release_file(self, name: str) -> None:
+        """Drop a lease taken by _upload_and_wait, deleting the file if it was retired meanwhile."""
+        self._leases[name] -= 1
+        if self._leases[name] <= 0:
+            del self._leases[name]
+            if name in self._retired:
+                self._retired.discard(name)
+                self._schedule_delete(name)
+    
+    def _on_file_evicted(self, myfile: types.File) -> None:
+        """Delete a Gemini file once its cache entry expires or is evicted."""
+        self._retire_file(myfile.name)
+    
+    async def sweep_file_cache(self, interval: float = 60) -> None:
+        """Periodically expire cached uploads so their Gemini files get deleted."""
+        while True:
+            await asyncio.sleep(interval)
+            self._file_cache.expire()
+    
+    async def shutdown(self) -> None:
+        """Delete every cached upload and wait for outstanding deletes to finish."""
+        self._file_cache.clear()
+        if _CLEANUP_TASKS:
+            await asyncio.gather(*_CLEANUP_TASKS, return_exceptions=True)
+
+    @classmethod
+    def _get_client(cls) -> genai.Client:
+        """Build the shared Gemini client on first use."""
+        if cls._shared_client is None:
+            limits = httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            )
+            # TCP keepalive probes catch pooled connections a NAT or load balancer
+            # dropped silently. The timing options are platform specific, so only
+            # those this platform has are set.
+            socket_options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            for option, value in (
+                ("TCP_KEEPIDLE", TCP_KEEPALIVE_IDLE),
+                ("TCP_KEEPINTVL", TCP_KEEPALIVE_INTERVAL),
+                ("TCP_KEEPCNT", TCP_KEEPALIVE_PROBES),
+            ):
+                if hasattr(socket, option):
+                    socket_options.append((socket.IPPROTO_TCP, getattr(socket, option), value))
+            # Explicit transports carry the pool limits and HTTP/2 for both the
+            # sync and async surfaces. A custom transport also keeps the SDK on
+            # httpx instead of opening a fresh aiohttp session per request.
+            sync_transport = httpx.HTTPTransport(
+                http2=True, limits=limits, socket_options=socket_options
+            )
+            async_transport = httpx.AsyncHTTPTransport(
+                http2=True, limits=limits, socket_options=socket_options
+            )
+            # The key comes from Settings (.env or the environment); os.environ is
+            # not populated from .env, so pass it explicitly
+            cls._shared_client = genai.Client(
+                api_key=settings.GOOGLE_API_KEY,
+                http_options=types.HttpOptions(
+                    client_args={"transport": sync_transport},
+                    async_client_args={"transport": async_transport}
+                )
+            )
+            cls._transports = (sync_transport, async_transport)
+        return cls._shared_client
+    
+    @classmethod
+    def _get_upload_sem(cls) -> asyncio.Semaphore:
+        """Return the semaphore that keeps upload bursts from flooding the Files API."""
+        if cls._upload_sem is None:
+            cls._upload_sem = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENT_UPLOADS)
+        return cls._upload_sem
+    
+    @classmethod
+    async def warmup(cls) -> None:
+        """Open a pooled connection to Gemini so the first request skips the TLS handshake."""
+        try:
+            await asyncio.wait_for(
+                cls._get_client().aio.files.list(config={"page_size": 1}),
+                timeout=WARMUP_TIMEOUT
+            )
+        except Exception as e:
+            # Startup must not fail or stall on this; the first request will just connect cold
+            logger.warning("Gemini warmup failed: %r", e)
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the shared client's connection pools. Call once on shutdown."""
+        if cls._shared_client is None:
+            return
+        sync_transport, async_transport = cls._transports
+        cls._shared_client = None
+        cls._transports = ()
+        cls._upload_sem = None
+        sync_transport.close()
+        await async_transport.aclose()
+    
+    def _create_evaluation_prompt(self, step_name: str, deliverable_name: str, additional_context: Optional[str] = None) -> str:
+        """Create a detailed prompt for evaluation based on the step and deliverable."""
+        head, tail = self._create_base_prompt(step_name, deliverable_name)
+        context = f"**Additional Context**: {additional_context}" if additional_context else ""
+        return "".join((head, context, tail))
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=PROMPT_CACHE_SIZE)
+    def _create_base_prompt(step_name: str, deliverable_name: str) -> tuple[str, str]:
+        """Render the prompt around the additional-context slot for a step and deliverable.
         
-        return base_prompt.strip()
\ No newline at end of file
+        Cached because most submissions share a handful of (step, deliverable) pairs;
+        the per-request context is joined in between the two halves.
+        """
+        head = _HEADER_HEAD.format(step=step_name, deliv=deliverable_name)
+        tail = "".join((
+            _HEADER_TAIL.format(step=step_name, deliv=deliverable_name),
+            _select_rubric(step_name),
+            _FOOTER
+        ))
+        return head.lstrip(), tail.rstrip()